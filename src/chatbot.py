@@ -11,9 +11,10 @@ from src.utils import call_ollama, extract_categories, calculate_importance
 
 
 class FamilyChatbot:
-    def __init__(self, db_path='family_chatbot.db'):
+    def __init__(self, db_path='family_chatbot.db', num_shards=1, dedup_distance=3, compress_text=False):
         """Initialize the chatbot with a database connection."""
-        self.db = DatabaseManager(db_path)
+        self.db = DatabaseManager(db_path, num_shards=num_shards, dedup_distance=dedup_distance,
+                                  compress_text=compress_text)
         # Simple response templates for tiny LLM
         self.templates = {
             'greetings': [
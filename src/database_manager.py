@@ -1,28 +1,83 @@
+import os
 import sqlite3
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from src.storage_router import HashShardRouter
+from src.memory_dedup import MemoryDeduplicator, text_hash
+from src.text_compression import SEED_TEXT, TEXT_RAW, TextCompressor, load_dictionaries, train_dictionary
 
 class DatabaseManager:
-    def __init__(self, db_path):
-        """Initialize database connection and create tables if they don't exist."""
+    def __init__(self, db_path, num_shards=1, router=None, dedup_distance=3, compress_text=False):
+        """Initialize database connections and create tables if they don't exist.
+
+        With the default single shard everything lives in db_path. Pass
+        num_shards or a custom router to spread members over several files.
+        dedup_distance is the SimHash distance under which a new memory counts
+        as a repeat of a recent one; None turns duplicate detection off.
+        compress_text stores new memory text zlib-compressed; compressed rows
+        are always read back transparently.
+        """
         self.db_path = db_path
+        self.router = router or HashShardRouter(db_path, num_shards)
+        self.dedup = MemoryDeduplicator(max_distance=dedup_distance) if dedup_distance is not None else None
+        self.compress_text = compress_text
+        self._check_unmigrated()
         self._connect()
-        self._create_tables()
-    
+        self.compressors = []
+        for conn, cursor in zip(self.conns, self.cursors):
+            self._create_tables(conn, cursor)
+            self.compressors.append(self._load_compressor(conn, cursor))
+
+    def _check_unmigrated(self):
+        """Refuse to open fresh shards next to a single-file database that still holds members."""
+        shard_paths = self.router.shard_paths()
+        if shard_paths == [self.db_path] or not os.path.exists(self.db_path):
+            return
+        if any(os.path.exists(path) for path in shard_paths):
+            return
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name FROM sqlite_master WHERE type = ? AND name = ?', ('table', 'family_members'))
+            has_members = bool(cursor.fetchone()) and bool(
+                cursor.execute('SELECT 1 FROM family_members LIMIT 1').fetchone())
+        finally:
+            conn.close()
+
+        if has_members:
+            raise ValueError(
+                f"{self.db_path} holds family members but its {len(shard_paths)} shard files don't exist yet. "
+                f"Split it first with: python -m src.storage_router {self.db_path} --shards {len(shard_paths)}"
+            )
+
     def _connect(self):
-        """Create a new database connection."""
+        """Create one database connection per shard."""
         try:
-            self.conn = sqlite3.connect(self.db_path)
-            self.cursor = self.conn.cursor()
+            self.conns = []
+            self.cursors = []
+            for path in self.router.shard_paths():
+                conn = sqlite3.connect(path)
+                self.conns.append(conn)
+                self.cursors.append(conn.cursor())
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
             raise
-        
-    def _create_tables(self):
-        """Create necessary database tables if they don't exist."""
+
+    def _shard(self, name):
+        """Return the (connection, cursor) pair of the shard holding a family member."""
+        index = self.router.shard_index(name)
+        return self.conns[index], self.cursors[index]
+
+    def _compressor(self, name):
+        """Return the text compressor of the shard holding a family member."""
+        return self.compressors[self.router.shard_index(name)]
+
+    def _create_tables(self, conn, cursor):
+        """Create necessary database tables in a shard if they don't exist."""
         try:
             # Family members table
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS family_members (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     name TEXT UNIQUE NOT NULL,
@@ -30,9 +85,9 @@ class DatabaseManager:
                     personal_info TEXT
                 )
             ''')
-            
+
             # Memories table
-            self.cursor.execute('''
+            cursor.execute('''
                 CREATE TABLE IF NOT EXISTS memories (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     family_member_id INTEGER,
@@ -41,24 +96,95 @@ class DatabaseManager:
                     category TEXT NOT NULL,
                     importance REAL NOT NULL,
                     embedding BLOB,
+                    count INTEGER NOT NULL DEFAULT 1,
+                    text_hash TEXT,
+                    text_format INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (family_member_id) REFERENCES family_members (id)
                 )
             ''')
-            
-            self.conn.commit()
+
+            # Shared settings such as zlib dictionaries
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS metadata (
+                    key TEXT PRIMARY KEY,
+                    value BLOB
+                )
+            ''')
+
+            # Databases created before duplicate detection and compression lack these columns
+            cursor.execute('PRAGMA table_info(memories)')
+            columns = [row[1] for row in cursor.fetchall()]
+            if 'count' not in columns:
+                cursor.execute('ALTER TABLE memories ADD COLUMN count INTEGER NOT NULL DEFAULT 1')
+            if 'text_hash' not in columns:
+                cursor.execute('ALTER TABLE memories ADD COLUMN text_hash TEXT')
+            if 'text_format' not in columns:
+                cursor.execute('ALTER TABLE memories ADD COLUMN text_format INTEGER NOT NULL DEFAULT 0')
+
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_memories_member_hash
+                ON memories (family_member_id, text_hash)
+            ''')
+
+            conn.commit()
         except sqlite3.Error as e:
             print(f"Error creating tables: {e}")
             raise
 
+    def _load_compressor(self, conn, cursor):
+        """Load a shard's dictionaries, training the first one if compression is on."""
+        compressor = TextCompressor(load_dictionaries(cursor), enabled=self.compress_text,
+                                    loader=lambda: load_dictionaries(conn.cursor()))
+        if self.compress_text and compressor.current_id is None:
+            self._save_dictionary(conn, cursor, compressor, self._recent_texts(cursor, compressor), dict_id=1)
+        return compressor
+
+    def _recent_texts(self, cursor, compressor, limit=2000):
+        """Plain text of a shard's most recent memories, for training dictionaries."""
+        cursor.execute('''
+            SELECT text, text_format FROM memories
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (limit,))
+        return [compressor.decode(value, text_format) for value, text_format in cursor.fetchall()]
+
+    def _save_dictionary(self, conn, cursor, compressor, samples, dict_id=None):
+        """Train a dictionary from samples and store it under dict_id, or the next free id.
+
+        If another connection stored that id first, its dictionary is kept and used.
+        """
+        dictionary = train_dictionary(samples or SEED_TEXT)
+        if dict_id is None:
+            dict_id = max(load_dictionaries(cursor), default=0) + 1
+        cursor.execute('''
+            INSERT OR IGNORE INTO metadata (key, value)
+            VALUES (?, ?)
+        ''', (f'zlib_dictionary:{dict_id}', dictionary))
+        conn.commit()
+        compressor.reload()
+
+    def _decode_rows(self, compressor, cursor):
+        """Fetch memories rows from cursor with compressed text replaced by the plain text."""
+        columns = [column[0] for column in cursor.description]
+        text_index = columns.index('text')
+        format_index = columns.index('text_format')
+        rows = []
+        for row in cursor.fetchall():
+            row = list(row)
+            row[text_index] = compressor.decode(row[text_index], row[format_index])
+            rows.append(tuple(row))
+        return rows
+
     def add_family_member(self, name, age, personal_info=None):
         """Add a new family member to the database."""
+        conn, cursor = self._shard(name)
         try:
-            self.cursor.execute('''
+            cursor.execute('''
                 INSERT INTO family_members (name, age, personal_info)
                 VALUES (?, ?, ?)
             ''', (name, age, json.dumps(personal_info or {})))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            conn.commit()
+            return cursor.lastrowid
         except sqlite3.IntegrityError:
             return None
         except sqlite3.Error as e:
@@ -67,62 +193,130 @@ class DatabaseManager:
 
     def get_member_info(self, name):
         """Get family member information."""
+        conn, cursor = self._shard(name)
         try:
-            self.cursor.execute('''
-                SELECT * FROM family_members 
+            cursor.execute('''
+                SELECT * FROM family_members
                 WHERE name = ?
             ''', (name,))
-            return self.cursor.fetchone()
+            return cursor.fetchone()
         except sqlite3.Error as e:
             print(f"Error getting member info: {e}")
             return None
 
     def store_memory(self, family_member_name, text, category, importance=0.5):
-        """Store a new memory entry in the database."""
+        """Store a new memory entry in the database.
+
+        Exact and near repeats of a recent memory bump that row's count and
+        timestamp instead of inserting a new row; its id is returned either way.
+        """
+        conn, cursor = self._shard(family_member_name)
         try:
             # Get family member ID
-            self.cursor.execute('SELECT id FROM family_members WHERE name = ?', (family_member_name,))
-            family_member_id = self.cursor.fetchone()
-            
+            cursor.execute('SELECT id FROM family_members WHERE name = ?', (family_member_name,))
+            family_member_id = cursor.fetchone()
+
             if not family_member_id:
                 raise ValueError(f"Family member {family_member_name} not found")
-                
+
             family_member_id = family_member_id[0]
-            
+            now = datetime.now().isoformat()
+            digest = text_hash(text)
+
+            if self.dedup:
+                duplicate_id, kind = self._find_duplicate(cursor, family_member_name, family_member_id, text, digest)
+                if duplicate_id and not self._bump_duplicate(cursor, duplicate_id, now, importance):
+                    # Another connection deleted it; rebuild this member's sketches and look again
+                    self.dedup.forget(family_member_name)
+                    duplicate_id, kind = self._find_duplicate(cursor, family_member_name, family_member_id, text, digest)
+                    if duplicate_id and not self._bump_duplicate(cursor, duplicate_id, now, importance):
+                        duplicate_id = None
+                if duplicate_id:
+                    conn.commit()
+                    self.dedup.stats[kind] += 1
+                    return duplicate_id
+
             # Store memory
-            self.cursor.execute('''
-                INSERT INTO memories (family_member_id, text, timestamp, category, importance)
-                VALUES (?, ?, ?, ?, ?)
+            stored_text, text_format = self._compressor(family_member_name).encode(text)
+            cursor.execute('''
+                INSERT INTO memories (family_member_id, text, timestamp, category, importance, text_hash, text_format)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (
                 family_member_id,
-                text,
-                datetime.now().isoformat(),
+                stored_text,
+                now,
                 category,
-                importance
+                importance,
+                digest,
+                text_format
             ))
-            self.conn.commit()
-            return self.cursor.lastrowid
+            conn.commit()
+            memory_id = cursor.lastrowid
+            if self.dedup:
+                self.dedup.remember(family_member_name, text, memory_id)
+                self.dedup.stats['stored'] += 1
+            return memory_id
         except sqlite3.Error as e:
             print(f"Error storing memory: {e}")
             return None
 
+    def _bump_duplicate(self, cursor, memory_id, now, importance):
+        """Count another repeat of a memory; False if the row no longer exists."""
+        cursor.execute('''
+            UPDATE memories
+            SET count = count + 1, timestamp = ?, importance = MAX(importance, ?)
+            WHERE id = ?
+        ''', (now, importance, memory_id))
+        return cursor.rowcount > 0
+
+    def _find_duplicate(self, cursor, name, family_member_id, text, digest):
+        """Return (memory_id, stats key) of an existing memory that text repeats, or (None, None)."""
+        cursor.execute('''
+            SELECT id FROM memories
+            WHERE family_member_id = ? AND text_hash = ?
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (family_member_id, digest))
+        row = cursor.fetchone()
+        if row:
+            return row[0], 'exact_duplicates'
+
+        if not self.dedup.is_loaded(name):
+            cursor.execute('''
+                SELECT id, text, text_format FROM memories
+                WHERE family_member_id = ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (family_member_id, self.dedup.max_sketches))
+            compressor = self._compressor(name)
+            rows = [(memory_id, compressor.decode(value, text_format))
+                    for memory_id, value, text_format in cursor.fetchall()]
+            self.dedup.load(name, reversed(rows))
+
+        duplicate_id = self.dedup.find_near_duplicate(name, text)
+        if duplicate_id:
+            return duplicate_id, 'near_duplicates'
+        return None, None
+
     def get_memories(self, family_member_name, limit=5):
         """Retrieve recent memories for a family member."""
+        conn, cursor = self._shard(family_member_name)
         try:
-            self.cursor.execute('''
+            cursor.execute('''
                 SELECT m.* FROM memories m
                 JOIN family_members fm ON m.family_member_id = fm.id
                 WHERE fm.name = ?
                 ORDER BY m.timestamp DESC
                 LIMIT ?
             ''', (family_member_name, limit))
-            return self.cursor.fetchall()
+            return self._decode_rows(self._compressor(family_member_name), cursor)
         except sqlite3.Error as e:
             print(f"Error retrieving memories: {e}")
             return []
 
     def get_relevant_memories(self, name, categories, limit=2):
         """Get memories relevant to current categories."""
+        conn, cursor = self._shard(name)
         try:
             placeholders = ','.join('?' * len(categories))
             query = f'''
@@ -133,93 +327,225 @@ class DatabaseManager:
                 ORDER BY m.timestamp DESC, m.importance DESC
                 LIMIT ?
             '''
-            
+
             params = [name] + categories + [limit]
-            self.cursor.execute(query, params)
-            return self.cursor.fetchall()
+            cursor.execute(query, params)
+            return self._decode_rows(self._compressor(name), cursor)
         except sqlite3.Error as e:
             print(f"Error retrieving relevant memories: {e}")
             return []
 
     def get_member_categories(self, name):
-        """Get all categories discussed with a family member."""
+        """Get all categories discussed with a family member, counting merged repeats."""
+        conn, cursor = self._shard(name)
         try:
-            self.cursor.execute('''
-                SELECT DISTINCT category, COUNT(*) as count
+            cursor.execute('''
+                SELECT DISTINCT category, SUM(m.count) as count
                 FROM memories m
                 JOIN family_members fm ON m.family_member_id = fm.id
                 WHERE fm.name = ?
                 GROUP BY category
             ''', (name,))
-            return self.cursor.fetchall()
+            return cursor.fetchall()
         except sqlite3.Error as e:
             print(f"Error retrieving member categories: {e}")
             return []
 
     def update_member_info(self, name, new_info):
         """Update a family member's personal information."""
+        conn, cursor = self._shard(name)
         try:
-            self.cursor.execute('''
+            cursor.execute('''
                 UPDATE family_members
                 SET personal_info = ?
                 WHERE name = ?
             ''', (json.dumps(new_info), name))
-            self.conn.commit()
+            conn.commit()
             return True
         except sqlite3.Error as e:
             print(f"Error updating member info: {e}")
             return False
 
     def delete_old_memories(self, days_old=30):
-        """Delete memories older than specified days."""
-        try:
-            cutoff_date = (datetime.now() - datetime.timedelta(days=days_old)).isoformat()
-            self.cursor.execute('''
-                DELETE FROM memories
-                WHERE timestamp < ?
-            ''', (cutoff_date,))
-            self.conn.commit()
+        """Delete memories older than specified days across all shards."""
+        try:
+            cutoff_date = (datetime.now() - timedelta(days=days_old)).isoformat()
+            for conn, cursor in zip(self.conns, self.cursors):
+                cursor.execute('''
+                    DELETE FROM memories
+                    WHERE timestamp < ?
+                ''', (cutoff_date,))
+                conn.commit()
+            if self.dedup:
+                self.dedup.reset()
             return True
         except sqlite3.Error as e:
             print(f"Error deleting old memories: {e}")
             return False
 
     def get_memory_stats(self, name):
-        """Get statistics about stored memories for a family member."""
+        """Get statistics about stored memories for a family member.
+
+        total_memories counts interactions, so merged repeats count once per message.
+        """
+        conn, cursor = self._shard(name)
         try:
-            self.cursor.execute('''
-                SELECT 
-                    COUNT(*) as total_memories,
+            cursor.execute('''
+                SELECT
+                    SUM(m.count) as total_memories,
                     AVG(importance) as avg_importance,
                     MAX(timestamp) as latest_interaction
                 FROM memories m
                 JOIN family_members fm ON m.family_member_id = fm.id
                 WHERE fm.name = ?
             ''', (name,))
-            result = self.cursor.fetchone()
-            if not result or result[0] == 0:  # No memories found
+            result = cursor.fetchone()
+            if not result or not result[0]:  # No memories found
                 return (0, None, None)
             return result
         except sqlite3.Error as e:
             print(f"Error retrieving memory stats: {e}")
             return (0, None, None)
 
+    def train_text_dictionary(self, sample_size=2000):
+        """Train a fresh dictionary per shard from recent memories for new rows.
+
+        Rows compressed with older dictionaries stay readable.
+        """
+        try:
+            for conn, cursor, compressor in zip(self.conns, self.cursors, self.compressors):
+                samples = self._recent_texts(cursor, compressor, sample_size)
+                self._save_dictionary(conn, cursor, compressor, samples)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error training text dictionary: {e}")
+            return False
+
+    def compress_existing_memories(self, batch_size=500, reclaim=True):
+        """Compress plain text rows in small batches so chats can carry on meanwhile.
+
+        Afterwards reclaim_space() hands the saved bytes back to the filesystem
+        unless reclaim is False. Returns the number of rows compressed; rows
+        that wouldn't shrink stay plain.
+        """
+        converted = 0
+        try:
+            for conn, cursor, compressor in zip(self.conns, self.cursors, self.compressors):
+                compressor.reload()
+                if compressor.current_id is None:
+                    self._save_dictionary(conn, cursor, compressor, self._recent_texts(cursor, compressor), dict_id=1)
+                # Compress even when new rows are being stored as plain text
+                encoder = TextCompressor(compressor.dictionaries)
+                last_id = 0
+                while True:
+                    cursor.execute('''
+                        SELECT id, text FROM memories
+                        WHERE text_format = ? AND id > ?
+                        ORDER BY id
+                        LIMIT ?
+                    ''', (TEXT_RAW, last_id, batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][0]
+
+                    updates = []
+                    for memory_id, text in rows:
+                        value, text_format = encoder.encode(text)
+                        if text_format != TEXT_RAW:
+                            updates.append((value, text_format, memory_id))
+                    cursor.executemany('''
+                        UPDATE memories
+                        SET text = ?, text_format = ?
+                        WHERE id = ?
+                    ''', updates)
+                    conn.commit()
+                    converted += len(updates)
+            if reclaim:
+                self.reclaim_space()
+            return converted
+        except sqlite3.Error as e:
+            print(f"Error compressing memories: {e}")
+            return converted
+
+    def database_size(self):
+        """Total size in bytes of all shard files."""
+        return sum(os.path.getsize(path) for path in self.router.shard_paths() if os.path.exists(path))
+
+    def reclaim_space(self):
+        """Shrink shard files after rows got smaller, returning (bytes_before, bytes_after).
+
+        Compressed rows shrink in place, leaving pages part-empty rather than
+        free, so auto-vacuum can't release them; VACUUM repacks each shard.
+        It rewrites the file and briefly blocks other connections.
+        """
+        before = self.database_size()
+        try:
+            for conn, cursor in zip(self.conns, self.cursors):
+                conn.commit()
+                cursor.execute('VACUUM')
+        except sqlite3.Error as e:
+            print(f"Error reclaiming space: {e}")
+        return before, self.database_size()
+
+    def get_all_members(self):
+        """List the names of all family members across every shard."""
+        try:
+            names = []
+            for cursor in self.cursors:
+                cursor.execute('SELECT name FROM family_members')
+                names.extend(row[0] for row in cursor.fetchall())
+            return sorted(names)
+        except sqlite3.Error as e:
+            print(f"Error listing family members: {e}")
+            return []
+
+    def get_family_stats(self):
+        """Get (total_members, total_memories, avg_importance, latest_interaction) across every shard.
+
+        Like get_memory_stats, total_memories counts merged repeats once per message.
+        """
+        try:
+            total_members = 0
+            total_memories = 0
+            total_rows = 0
+            importance_sum = 0.0
+            latest = None
+            for cursor in self.cursors:
+                cursor.execute('SELECT COUNT(*) FROM family_members')
+                total_members += cursor.fetchone()[0]
+                cursor.execute('''
+                    SELECT SUM(count), COUNT(*), SUM(importance), MAX(timestamp)
+                    FROM memories
+                ''')
+                count, rows, shard_importance, shard_latest = cursor.fetchone()
+                total_memories += count or 0
+                total_rows += rows
+                importance_sum += shard_importance or 0.0
+                if shard_latest and (latest is None or shard_latest > latest):
+                    latest = shard_latest
+            avg_importance = importance_sum / total_rows if total_rows else None
+            return (total_members, total_memories, avg_importance, latest)
+        except sqlite3.Error as e:
+            print(f"Error retrieving family stats: {e}")
+            return (0, 0, None, None)
+
     def close_connection(self):
-        """Properly close the database connection."""
+        """Properly close every shard connection."""
         try:
-            if hasattr(self, 'cursor') and self.cursor:
-                self.cursor.close()
-                self.cursor = None
-            if hasattr(self, 'conn') and self.conn:
-                self.conn.close()
-                self.conn = None
+            for cursor in getattr(self, 'cursors', None) or []:
+                cursor.close()
+            self.cursors = []
+            for conn in getattr(self, 'conns', None) or []:
+                conn.close()
+            self.conns = []
         except sqlite3.Error as e:
             print(f"Error closing connection: {e}")
 
     def __enter__(self):
         """Context manager support."""
         return self
-        
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Ensure connection is closed when context ends."""
         self.close_connection()
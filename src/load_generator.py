@@ -0,0 +1,337 @@
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import src.utils
+from src.chatbot import FamilyChatbot
+from src.storage_router import HashShardRouter
+
+# Share of each kind of message, matched to the routes in _get_message_type
+# plus the joke branch of _generate_response.
+MESSAGE_MIX = {
+    'greeting': 0.25,
+    'technical': 0.30,
+    'story': 0.20,
+    'joke': 0.10,
+    'chat': 0.15,
+}
+
+MESSAGES = {
+    'greeting': ["G'day!", "Hey there!", "Hello again!", "Hi, {name} here."],
+    'technical': [
+        "Can you help me fix my {thing}?",
+        "How do I repair a flat tyre on the {thing}?",
+        "The {thing} is making a weird noise, how can I fix it?",
+        "I need to change the battery in the {thing}.",
+    ],
+    'story': [
+        "Tell me a story about the {thing}.",
+        "Tell me about the time we took the {thing} to the beach.",
+        "Got a bedtime story for the kids?",
+    ],
+    'joke': ["Tell me a joke!", "Got a joke about the {thing}?", "I need a good joke today."],
+    'chat': [
+        "We went to the beach today and the kids loved it.",
+        "I made pasta for dinner tonight.",
+        "Work was busy, but the weekend is nearly here.",
+        "The footy was great on the weekend, we won by ten points.",
+        "Planning to paint the fence next week.",
+    ],
+}
+
+THINGS = ['bike', 'car', 'lawnmower', 'dishwasher', 'laptop', 'ute', 'BBQ', 'fridge']
+
+# Statements that take SQLite's write lock, and so block while another connection holds it
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class TimedWrites:
+    """Stand-in for a sqlite3 connection or cursor that times write statements and commits.
+
+    Single-row writes take microseconds, so time spent here is almost all
+    waiting for another connection to release the file lock.
+    """
+
+    def __init__(self, target, times):
+        self._target = target
+        self._times = times
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def _timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._times.append(time.perf_counter() - start)
+
+    def execute(self, sql, *args):
+        if sql.lstrip().upper().startswith(WRITE_STATEMENTS):
+            return self._timed(self._target.execute, sql, *args)
+        return self._target.execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self._timed(self._target.executemany, sql, *args)
+
+    def commit(self):
+        return self._timed(self._target.commit)
+
+
+class OllamaStubHandler(BaseHTTPRequestHandler):
+    """Answer /api/generate like Ollama after a configurable delay."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        prompt = json.loads(body or b'{}').get('prompt', '')
+        server = self.server
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        if 'joke' in prompt:
+            text = "Why did the kangaroo cross the road? To get to the other bush."
+        else:
+            text = "No worries mate, happy to have a yarn about that."
+        payload = json.dumps({'response': text}).encode('utf-8')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        """Keep the stub quiet while the load runs."""
+        pass
+
+
+def start_ollama_stub(latency=0.2, jitter=0.05, port=0):
+    """Start a local Ollama stand-in on a background thread and return the server."""
+    server = ThreadingHTTPServer(('127.0.0.1', port), OllamaStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values):
+    """Millisecond p50/p95/p99/mean/max of a list of second durations."""
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50': round(percentile(values, 50) * 1000, 2),
+        'p95': round(percentile(values, 95) * 1000, 2),
+        'p99': round(percentile(values, 99) * 1000, 2),
+        'mean': round(sum(values) / len(values) * 1000, 2),
+        'max': round(max(values) * 1000, 2),
+    }
+
+
+def pick_message(rng, name):
+    """Pick a (kind, message) pair following MESSAGE_MIX."""
+    kind = rng.choices(list(MESSAGE_MIX), weights=list(MESSAGE_MIX.values()))[0]
+    template = rng.choice(MESSAGES[kind])
+    return kind, template.format(name=name, thing=rng.choice(THINGS))
+
+
+class SimulatedMember(threading.Thread):
+    """One family member chatting in a loop on their own chatbot connection."""
+
+    def __init__(self, name, db_path, messages, think_time, seed, start_event, chatbot_options):
+        super().__init__(daemon=True)
+        self.name = name
+        self.db_path = db_path
+        self.messages = messages
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.start_event = start_event
+        self.ready = threading.Event()
+        self.chatbot_options = chatbot_options
+        self.latencies = {}
+        self.store_times = []
+        self.write_times = []
+        self.pending_writes = []
+        self.store_errors = 0
+        self.errors = []
+
+    def _timed_store(self, store_memory):
+        """Wrap store_memory to record its total time and the part spent in SQLite writes."""
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = store_memory(*args, **kwargs)
+            self.store_times.append(time.perf_counter() - start)
+            self.write_times.append(sum(self.pending_writes))
+            self.pending_writes.clear()
+            if result is None:
+                self.store_errors += 1
+            return result
+        return wrapper
+
+    def run(self):
+        # sqlite3 connections belong to the thread that opened them
+        try:
+            chatbot = FamilyChatbot(self.db_path, **self.chatbot_options)
+            db = chatbot.db
+            db.conns = [TimedWrites(conn, self.pending_writes) for conn in db.conns]
+            db.cursors = [TimedWrites(cursor, self.pending_writes) for cursor in db.cursors]
+            db.store_memory = self._timed_store(db.store_memory)
+        except Exception as e:
+            self.errors.append(f"{type(e).__name__}: {e}")
+            return
+        finally:
+            self.ready.set()
+        self.start_event.wait()
+        try:
+            for _ in range(self.messages):
+                kind, message = pick_message(self.rng, self.name)
+                start = time.perf_counter()
+                try:
+                    chatbot.chat(self.name, message)
+                except Exception as e:
+                    self.errors.append(f"{type(e).__name__}: {e}")
+                    continue
+                self.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+                if self.think_time:
+                    time.sleep(self.rng.expovariate(1 / self.think_time))
+        finally:
+            chatbot.db.close_connection()
+
+
+def run_load_test(members=10, messages=20, latency=0.2, jitter=0.05, think_time=0.0,
+                  db_path='load_test.db', num_shards=1, compress_text=False, seed=0, keep_db=False,
+                  overwrite=False):
+    """Run concurrent simulated members against a stubbed Ollama and return a report dict.
+
+    db_path is a scratch database that is deleted afterwards unless keep_db is
+    set. Existing files are never touched unless overwrite is set.
+    """
+    router = HashShardRouter(db_path, num_shards)
+    existing = [path for path in router.shard_paths() if os.path.exists(path)]
+    if existing and not overwrite:
+        raise FileExistsError(f"{', '.join(existing)} already exists; pass overwrite=True to replace it")
+    for path in existing:
+        os.remove(path)
+
+    chatbot_options = {'num_shards': num_shards, 'compress_text': compress_text}
+    setup = FamilyChatbot(db_path, **chatbot_options)
+    names = [f"Member{i}" for i in range(members)]
+    for name in names:
+        setup.add_family_member(name, 30, {})
+    setup.db.close_connection()
+
+    stub = start_ollama_stub(latency, jitter)
+    original_url = src.utils.OLLAMA_URL
+    src.utils.OLLAMA_URL = f"http://127.0.0.1:{stub.server_address[1]}/api/generate"
+
+    start_event = threading.Event()
+    workers = [
+        SimulatedMember(name, db_path, messages, think_time, seed + i, start_event, chatbot_options)
+        for i, name in enumerate(names)
+    ]
+    try:
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.ready.wait()
+        started = time.perf_counter()
+        start_event.set()
+        for worker in workers:
+            worker.join()
+        duration = time.perf_counter() - started
+    finally:
+        src.utils.OLLAMA_URL = original_url
+        stub.shutdown()
+        stub.server_close()
+        if not keep_db:
+            for path in router.shard_paths():
+                if os.path.exists(path):
+                    os.remove(path)
+
+    by_kind = {}
+    for worker in workers:
+        for kind, values in worker.latencies.items():
+            by_kind.setdefault(kind, []).extend(values)
+    all_latencies = [value for values in by_kind.values() for value in values]
+    store_times = [value for worker in workers for value in worker.store_times]
+    write_times = [value for worker in workers for value in worker.write_times]
+    errors = [error for worker in workers for error in worker.errors]
+
+    return {
+        'config': {
+            'members': members,
+            'messages_per_member': messages,
+            'stub_latency_ms': latency * 1000,
+            'stub_jitter_ms': jitter * 1000,
+            'think_time_s': think_time,
+            'num_shards': num_shards,
+            'compress_text': compress_text,
+        },
+        'duration_s': round(duration, 3),
+        'requests': len(all_latencies),
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'throughput_rps': round(len(all_latencies) / duration, 2) if duration else None,
+        'latency_ms': summarize(all_latencies),
+        'latency_ms_by_type': {kind: summarize(values) for kind, values in sorted(by_kind.items())},
+        'sqlite': {
+            # Per store_memory call: time in write statements and commits, which
+            # serialize on each shard's file lock, so lock waits show up here
+            'write_ms': summarize(write_times),
+            # Whole store_memory call, including duplicate checks and compression
+            'store_memory_ms': summarize(store_times),
+            'store_errors': sum(worker.store_errors for worker in workers),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test FamilyChatbot with simulated family members.")
+    parser.add_argument('--members', type=int, default=10, help="Number of concurrent family members")
+    parser.add_argument('--messages', type=int, default=20, help="Messages each member sends")
+    parser.add_argument('--latency', type=float, default=0.2, help="Mean stub Ollama latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.05, help="Std deviation of stub latency in seconds")
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between a member's messages")
+    parser.add_argument('--db', default='load_test.db', help="Scratch database path")
+    parser.add_argument('--shards', type=int, default=1, help="Number of shard files")
+    parser.add_argument('--compress-text', action='store_true', help="Store memory text compressed")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for message choice")
+    parser.add_argument('--keep-db', action='store_true', help="Keep the scratch database afterwards")
+    parser.add_argument('--overwrite', action='store_true', help="Replace the scratch database if it already exists")
+    args = parser.parse_args()
+
+    try:
+        report = run_load_test(
+            members=args.members,
+            messages=args.messages,
+            latency=args.latency,
+            jitter=args.jitter,
+            think_time=args.think_time,
+            db_path=args.db,
+            num_shards=args.shards,
+            compress_text=args.compress_text,
+            seed=args.seed,
+            keep_db=args.keep_db,
+            overwrite=args.overwrite,
+        )
+    except FileExistsError as e:
+        parser.error(str(e))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import hashlib
+import re
+from collections import deque
+
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace so trivial edits compare equal."""
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return ' '.join(text.split())
+
+
+def text_hash(text):
+    """Stable hash of the normalized text, used to spot exact repeats."""
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+def simhash(text, bits=64):
+    """64-bit SimHash over word unigrams and bigrams of the normalized text."""
+    words = normalize_text(text).split()
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not features:
+        return 0
+
+    weights = [0] * bits
+    for feature in features:
+        h = int.from_bytes(hashlib.md5(feature.encode('utf-8')).digest()[:8], 'big')
+        for i in range(bits):
+            weights[i] += 1 if (h >> i) & 1 else -1
+
+    fingerprint = 0
+    for i in range(bits):
+        if weights[i] > 0:
+            fingerprint |= 1 << i
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two fingerprints."""
+    return bin(a ^ b).count('1')
+
+
+class MemoryDeduplicator:
+    """Keep recent SimHash sketches per family member to catch near-repeat messages."""
+
+    def __init__(self, max_distance=3, max_sketches=256):
+        """max_distance is the largest Hamming distance still treated as a repeat."""
+        self.max_distance = max_distance
+        self.max_sketches = max_sketches
+        self.sketches = {}
+        self.stats = {'stored': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+
+    def is_loaded(self, name):
+        """Whether sketches for a member have been seeded this session."""
+        return name in self.sketches
+
+    def load(self, name, rows):
+        """Seed a member's sketches from (memory_id, text) rows, oldest first."""
+        sketches = deque(maxlen=self.max_sketches)
+        for memory_id, text in rows:
+            sketches.append((simhash(text), memory_id))
+        self.sketches[name] = sketches
+
+    def find_near_duplicate(self, name, text):
+        """Return the id of a recent memory close enough to text, or None."""
+        fingerprint = simhash(text)
+        for other, memory_id in reversed(self.sketches.get(name, ())):
+            if hamming_distance(fingerprint, other) <= self.max_distance:
+                return memory_id
+        return None
+
+    def remember(self, name, text, memory_id):
+        """Record the sketch of a newly stored memory."""
+        if name not in self.sketches:
+            self.sketches[name] = deque(maxlen=self.max_sketches)
+        self.sketches[name].append((simhash(text), memory_id))
+
+    def forget(self, name):
+        """Drop a member's sketches so they are reloaded from the database."""
+        self.sketches.pop(name, None)
+
+    def reset(self):
+        """Forget all sketches, e.g. after memories were deleted."""
+        self.sketches = {}
@@ -0,0 +1,125 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+from src.memory_dedup import text_hash
+
+
+class HashShardRouter:
+    """Route family members to SQLite shard files by a stable hash of their name."""
+
+    def __init__(self, db_path, num_shards=1, key_func=None):
+        """Set up the router.
+
+        key_func maps a member name to the key that gets hashed, e.g. a
+        household name, so members sharing a key always land together.
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.db_path = db_path
+        self.num_shards = num_shards
+        self.key_func = key_func or (lambda name: name)
+
+    def shard_index(self, name):
+        """Return the shard index for a member name."""
+        if self.num_shards == 1:
+            return 0
+        key = str(self.key_func(name)).encode('utf-8')
+        digest = hashlib.sha1(key).digest()
+        return int.from_bytes(digest[:8], 'big') % self.num_shards
+
+    def shard_path(self, index):
+        """Return the file path of a shard. A single shard is the db_path itself."""
+        if self.num_shards == 1:
+            return self.db_path
+        root, ext = os.path.splitext(self.db_path)
+        return f"{root}.shard{index}{ext or '.db'}"
+
+    def shard_paths(self):
+        """Return the file paths of all shards in index order."""
+        return [self.shard_path(i) for i in range(self.num_shards)]
+
+
+def migrate_to_shards(source_path, router):
+    """Split an existing single-file database into the router's shards.
+
+    Members are re-inserted into their target shard and their memories are
+    re-pointed at the new member ids. Compressed text is copied back out as
+    plain text since each shard keeps its own dictionary. Each member is
+    committed together with their memories, and members already in their
+    shard are skipped, so re-running after a partial failure is safe.
+    Returns (members, memories) copied.
+    """
+    # Imported here to avoid a circular import with DatabaseManager
+    from src.database_manager import DatabaseManager
+    from src.text_compression import TextCompressor, has_column, load_dictionaries
+
+    if os.path.abspath(source_path) in [os.path.abspath(p) for p in router.shard_paths()]:
+        raise ValueError("Source database cannot also be a shard target")
+
+    # Creating the shard files up front tells DatabaseManager the split is under way
+    for path in router.shard_paths():
+        sqlite3.connect(path).close()
+
+    source = sqlite3.connect(source_path)
+    target = DatabaseManager(source_path, router=router)
+    members_copied = 0
+    memories_copied = 0
+    try:
+        src_cursor = source.cursor()
+        # Older files predate the duplicate counter and compressed text
+        count_column = 'count' if has_column(src_cursor, 'memories', 'count') else '1'
+        format_column = 'text_format' if has_column(src_cursor, 'memories', 'text_format') else '0'
+        compressor = TextCompressor(load_dictionaries(src_cursor))
+
+        src_cursor.execute('SELECT id, name, age, personal_info FROM family_members')
+        for old_id, name, age, personal_info in src_cursor.fetchall():
+            conn, cursor = target._shard(name)
+            cursor.execute('SELECT id FROM family_members WHERE name = ?', (name,))
+            if cursor.fetchone():
+                continue
+            cursor.execute('''
+                INSERT INTO family_members (name, age, personal_info)
+                VALUES (?, ?, ?)
+            ''', (name, age, personal_info))
+            new_id = cursor.lastrowid
+            members_copied += 1
+
+            mem_cursor = source.execute(f'''
+                SELECT text, timestamp, category, importance, embedding, {count_column}, {format_column}
+                FROM memories
+                WHERE family_member_id = ?
+                ORDER BY id
+            ''', (old_id,))
+            rows = []
+            for row in mem_cursor.fetchall():
+                text = compressor.decode(row[0], row[6])
+                rows.append((new_id, text) + tuple(row[1:6]) + (text_hash(text),))
+            cursor.executemany('''
+                INSERT INTO memories (family_member_id, text, timestamp, category, importance, embedding, count, text_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+            memories_copied += len(rows)
+            conn.commit()
+    finally:
+        source.close()
+        target.close_connection()
+
+    return members_copied, memories_copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split a family chatbot database into shard files.")
+    parser.add_argument('source', help="Existing database file, e.g. family_chatbot.db")
+    parser.add_argument('--shards', type=int, required=True, help="Number of shard files to create")
+    args = parser.parse_args()
+
+    router = HashShardRouter(args.source, args.shards)
+    members, memories = migrate_to_shards(args.source, router)
+    print(f"Copied {members} members and {memories} memories into {args.shards} shards:")
+    for path in router.shard_paths():
+        print(f"  {path}")
+
+
+if __name__ == "__main__":
+    main()
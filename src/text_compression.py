@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections import Counter
+from src.storage_router import HashShardRouter
+
+# memories.text_format values: 0 is plain text, anything else is the id of
+# the zlib dictionary the row was compressed with.
+TEXT_RAW = 0
+
+# Used when a shard has no text to learn from yet
+SEED_TEXT = [
+    "G'day mate, how's things? What's new today?",
+    "I went to work and then home for the weekend with the kids.",
+    "Can you help me fix the bike? I think the chain is broken.",
+    "Tell me a story about the family. That's fair dinkum!",
+    "I feel happy, I love it and I like it, thank you so much.",
+]
+
+
+def train_dictionary(samples, max_size=16384):
+    """Build a zlib preset dictionary from the most useful phrases in samples.
+
+    zlib looks back from the end of the dictionary, so the highest scoring
+    phrases are placed last.
+    """
+    counts = Counter()
+    for text in samples:
+        words = text.split()
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                counts[' '.join(words[i:i + n])] += 1
+
+    scored = [
+        (count * len(phrase), phrase)
+        for phrase, count in counts.items()
+        if count > 1 or len(samples) < 10
+    ]
+    scored.sort(reverse=True)
+
+    chosen = []
+    size = 0
+    for _, phrase in scored:
+        piece = phrase.encode('utf-8') + b' '
+        if size + len(piece) > max_size:
+            break
+        chosen.append(piece)
+        size += len(piece)
+    return b''.join(reversed(chosen))
+
+
+def load_dictionaries(cursor):
+    """Read the zlib dictionaries stored in a database's metadata table."""
+    cursor.execute('SELECT name FROM sqlite_master WHERE type = ? AND name = ?', ('table', 'metadata'))
+    if not cursor.fetchone():
+        return {}
+    cursor.execute("SELECT key, value FROM metadata WHERE key LIKE 'zlib_dictionary:%'")
+    return {int(key.split(':')[1]): value for key, value in cursor.fetchall()}
+
+
+def has_column(cursor, table, column):
+    """Whether a table has a column, for files created by older versions."""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return column in [row[1] for row in cursor.fetchall()]
+
+
+class TextCompressor:
+    """Compress memory text with raw deflate and a shared preset dictionary."""
+
+    def __init__(self, dictionaries=None, enabled=True, level=9, loader=None):
+        """dictionaries maps dictionary id to its bytes; the highest id is used for new rows.
+
+        loader returns the current dictionaries from storage, so rows written
+        with a dictionary another connection added later can still be read.
+        """
+        self.dictionaries = dict(dictionaries or {})
+        self.enabled = enabled
+        self.level = level
+        self.loader = loader
+
+    @property
+    def current_id(self):
+        """Id of the dictionary used for new rows, or None if there is none."""
+        return max(self.dictionaries) if self.dictionaries else None
+
+    def add_dictionary(self, dict_id, data):
+        """Register a dictionary under an id."""
+        self.dictionaries[dict_id] = data
+
+    def reload(self):
+        """Refresh the dictionaries from storage, if there is a loader."""
+        if self.loader:
+            self.dictionaries = dict(self.loader())
+
+    def encode(self, text):
+        """Return (value, text_format) for storing text."""
+        dict_id = self.current_id
+        if not self.enabled or dict_id is None:
+            return text, TEXT_RAW
+
+        raw = text.encode('utf-8')
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15, 9,
+                                      zlib.Z_DEFAULT_STRATEGY, self.dictionaries[dict_id])
+        compressed = compressor.compress(raw) + compressor.flush()
+        # Short messages like "hi" don't shrink, so keep those readable
+        if len(compressed) >= len(raw):
+            return text, TEXT_RAW
+        return compressed, dict_id
+
+    def decode(self, value, text_format):
+        """Return the plain text of a stored value."""
+        if not text_format:
+            return value
+        if text_format not in self.dictionaries:
+            self.reload()
+        decompressor = zlib.decompressobj(-15, zdict=self.dictionaries[text_format])
+        return (decompressor.decompress(value) + decompressor.flush()).decode('utf-8')
+
+
+def benchmark(db_path, repeat=5, train_fraction=0.5):
+    """Compare storage size and read cost of plain, zlib and zlib+dictionary text.
+
+    The dictionary is trained on the oldest train_fraction of rows and every
+    variant is measured on the newer rest, as it would be used in practice.
+    Works on a copy of the texts in memory, so the database is left untouched.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        stored = TextCompressor(load_dictionaries(cursor))
+        text_format = 'text_format' if has_column(cursor, 'memories', 'text_format') else '0'
+        cursor.execute(f"SELECT text, {text_format} FROM memories ORDER BY id")
+        texts = [stored.decode(value, text_format) for value, text_format in cursor.fetchall()]
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        free_pages = cursor.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+
+    results = {
+        'file_bytes': os.path.getsize(db_path),
+        'free_bytes': free_pages * page_size,
+        'rows': len(texts),
+    }
+    split = int(len(texts) * train_fraction)
+    training, texts = texts[:split], texts[split:]
+    if not training or not texts:
+        return results
+
+    dictionary = train_dictionary(training)
+    plain_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    results.update({'training_rows': len(training), 'measured_rows': len(texts),
+                    'dictionary_bytes': len(dictionary)})
+    variants = {
+        'plain': TextCompressor(enabled=False),
+        'zlib': TextCompressor({1: b''}),
+        'zlib_dictionary': TextCompressor({1: dictionary}),
+    }
+    for label, compressor in variants.items():
+        encoded = [compressor.encode(text) for text in texts]
+        size = sum(len(value.encode('utf-8')) if not fmt else len(value) for value, fmt in encoded)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for value, fmt in encoded:
+                compressor.decode(value, fmt)
+        elapsed = time.perf_counter() - start
+
+        results[label] = {
+            'bytes': size,
+            'ratio': round(size / plain_bytes, 3),
+            'read_us_per_row': round(elapsed / (repeat * len(texts)) * 1e6, 3),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress stored memory text.")
+    parser.add_argument('db_path', help="Database file, e.g. family_chatbot.db")
+    parser.add_argument('--shards', type=int, default=1, help="Number of shard files the database uses")
+    parser.add_argument('--migrate', action='store_true', help="Compress existing plain text rows in place")
+    parser.add_argument('--benchmark', action='store_true', help="Report size savings against read cost")
+    args = parser.parse_args()
+
+    if args.migrate:
+        # Imported here to avoid a circular import with DatabaseManager
+        from src.database_manager import DatabaseManager
+        with DatabaseManager(args.db_path, num_shards=args.shards, compress_text=True) as db:
+            before = db.database_size()
+            converted = db.compress_existing_memories()
+            after = db.database_size()
+        print(f"Compressed {converted} memories; database size {before:,} -> {after:,} bytes.")
+
+    if args.benchmark:
+        for path in HashShardRouter(args.db_path, args.shards).shard_paths():
+            print(json.dumps({'database': path, **benchmark(path)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,15 @@
+import os
 import requests
 from datetime import datetime
 import re
 
+# Override with the OLLAMA_URL environment variable, e.g. to point at a test stub
+OLLAMA_URL = os.environ.get('OLLAMA_URL', 'http://localhost:11434/api/generate')
+
 def call_ollama(prompt, model="tinyllama:chat"):
     """Make a call to the Ollama API."""
     try:
-        response = requests.post('http://localhost:11434/api/generate',
+        response = requests.post(OLLAMA_URL,
             json={
                 "model": model,
                 "prompt": prompt,
@@ -0,0 +1,257 @@
+import sys
+import os
+from pathlib import Path
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.database_manager import DatabaseManager
+from src.storage_router import HashShardRouter, migrate_to_shards
+from src.text_compression import benchmark
+
+def remove_db_files(*paths):
+    """Helper function to remove test database files."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def test_sharded_routing():
+    """Test that members are routed to stable shards and cross-shard stats add up."""
+    test_db = "test_sharded.db"
+    router = HashShardRouter(test_db, 4)
+    remove_db_files(*router.shard_paths())
+    db = None
+
+    try:
+        db = DatabaseManager(test_db, num_shards=4)
+        names = ["Alice", "Bob", "Charlie", "David", "Eve", "Frank"]
+        for name in names:
+            assert db.add_family_member(name, 30, {})
+            db.store_memory(name, f"{name} went fishing", "daily_life")
+
+        # The same name always hashes to the same shard
+        assert router.shard_index("Alice") == HashShardRouter(test_db, 4).shard_index("Alice")
+        assert db.add_family_member("Alice", 30, {}) is None
+
+        assert db.get_memories("Charlie")[0][2] == "Charlie went fishing"
+        assert db.get_all_members() == sorted(names)
+
+        total_members, total_memories, avg_importance, latest = db.get_family_stats()
+        assert total_members == len(names)
+        assert total_memories == len(names)
+        assert avg_importance == 0.5
+        assert latest is not None
+
+    finally:
+        if db:
+            db.close_connection()
+        remove_db_files(*router.shard_paths())
+
+def test_migrate_to_shards():
+    """Test splitting an existing single-file database into shards."""
+    test_db = "test_migrate_source.db"
+    router = HashShardRouter(test_db, 3)
+    remove_db_files(test_db, *router.shard_paths())
+    db = None
+
+    try:
+        with DatabaseManager(test_db) as source:
+            for name in ["Alice", "Bob", "Charlie"]:
+                source.add_family_member(name, 40, {"role": "parent"})
+                source.store_memory(name, "Hello there", "general")
+                source.store_memory(name, "Fix the bike", "technical")
+
+        # Opening shards over the unmigrated file would hide every member
+        try:
+            DatabaseManager(test_db, router=router)
+            assert False, "Expected ValueError"
+        except ValueError as e:
+            assert "python -m src.storage_router" in str(e)
+        assert not any(os.path.exists(path) for path in router.shard_paths())
+
+        members, memories = migrate_to_shards(test_db, router)
+        assert (members, memories) == (3, 6)
+
+        # Re-running copies nothing new instead of duplicating memories
+        assert migrate_to_shards(test_db, router) == (0, 0)
+
+        db = DatabaseManager(test_db, router=router)
+        assert db.get_member_info("Bob")[1] == "Bob"
+        assert db.get_memory_stats("Bob")[0] == 2
+        assert db.get_family_stats()[:2] == (3, 6)
+
+    finally:
+        if db:
+            db.close_connection()
+        remove_db_files(test_db, *router.shard_paths())
+
+def test_duplicate_memories_are_merged():
+    """Test that exact and near repeats bump the existing memory instead of inserting."""
+    test_db = "test_dedup.db"
+    remove_db_files(test_db)
+    db = None
+
+    try:
+        db = DatabaseManager(test_db)
+        db.add_family_member("Alice", 35, {})
+
+        first_id = db.store_memory("Alice", "I made a great pasta dish today!", "daily_life")
+        assert db.store_memory("Alice", "i made a great pasta dish today", "daily_life") == first_id
+        near = "I made a really great pasta dish today for the whole family after work!"
+        near_id = db.store_memory("Alice", near, "daily_life")
+        assert db.store_memory("Alice", near + " Yum", "daily_life") == near_id
+        other_id = db.store_memory("Alice", "Fix the flat tyre on my bike", "technical")
+        assert len({first_id, near_id, other_id}) == 3
+
+        # Summaries still count every message sent
+        assert db.get_memory_stats("Alice")[0] == 5
+        assert db.get_member_categories("Alice") == [('daily_life', 4), ('technical', 1)]
+        assert db.get_family_stats()[1] == 5
+        assert db.dedup.stats == {'stored': 3, 'exact_duplicates': 1, 'near_duplicates': 1}
+        counts = {row[0]: row[7] for row in db.get_memories("Alice")}
+        assert counts == {first_id: 2, near_id: 2, other_id: 1}
+
+        # Sketches are rebuilt from the database after a restart
+        db.close_connection()
+        db = DatabaseManager(test_db)
+        assert db.store_memory("Alice", near + " Yum!", "daily_life") == near_id
+        assert db.dedup.stats['near_duplicates'] == 1
+
+    finally:
+        if db:
+            db.close_connection()
+        remove_db_files(test_db)
+
+def test_duplicate_deleted_by_another_connection():
+    """Test that a repeat of a memory deleted elsewhere is stored rather than lost."""
+    test_db = "test_dedup_shared.db"
+    remove_db_files(test_db)
+    first = second = None
+    message = "The ute is making a weird noise, how can I fix it?"
+
+    try:
+        first = DatabaseManager(test_db)
+        second = DatabaseManager(test_db)
+        first.add_family_member("Alice", 35, {})
+        assert first.store_memory("Alice", message, "technical") == 1
+
+        assert second.delete_old_memories(days_old=-1)
+        # The hash lookup misses, but first's cached sketch still points at the deleted row
+        new_id = first.store_memory("Alice", message, "technical")
+
+        assert new_id != 1
+        assert [row[0] for row in first.get_memories("Alice")] == [new_id]
+        assert first.get_memory_stats("Alice")[0] == 1
+        assert first.dedup.stats == {'stored': 2, 'exact_duplicates': 0, 'near_duplicates': 0}
+
+    finally:
+        for db in (first, second):
+            if db:
+                db.close_connection()
+        remove_db_files(test_db)
+
+def test_compressed_memory_text():
+    """Test that compressed and plain rows coexist and read back transparently."""
+    test_db = "test_compression.db"
+    remove_db_files(test_db)
+    db = None
+    story = "We went camping at the lake and caught three fish before the storm rolled in over the hills."
+
+    try:
+        db = DatabaseManager(test_db)
+        db.add_family_member("Bob", 40, {})
+        db.store_memory("Bob", story, "story")
+        db.close_connection()
+
+        db = DatabaseManager(test_db, compress_text=True)
+        db.store_memory("Bob", "Then we drove home and cooked the fish for dinner with the whole family.", "story")
+        db.store_memory("Bob", "hi", "general")
+
+        db.cursors[0].execute('SELECT text_format FROM memories ORDER BY id')
+        assert [row[0] for row in db.cursors[0].fetchall()] == [0, 1, 0]
+
+        assert db.compress_existing_memories() == 1
+        db.cursors[0].execute('SELECT text_format FROM memories ORDER BY id')
+        assert [row[0] for row in db.cursors[0].fetchall()] == [1, 1, 0]
+
+        texts = [row[2] for row in db.get_memories("Bob")]
+        assert story in texts and "hi" in texts
+        assert db.get_relevant_memories("Bob", ["story"], limit=5)[-1][2] == story
+
+        # Near repeats are still caught against compressed rows after a restart
+        db.close_connection()
+        db = DatabaseManager(test_db, compress_text=True)
+        assert db.store_memory("Bob", story + " Brr!", "story") == 1
+
+    finally:
+        if db:
+            db.close_connection()
+        remove_db_files(test_db)
+
+def test_compression_across_connections():
+    """Test that dictionaries added by another connection are picked up when reading."""
+    test_db = "test_compression_shared.db"
+    remove_db_files(test_db)
+    reader = writer = other = None
+    story = "We went camping at the lake and caught three fish before the storm rolled in over the hills."
+
+    try:
+        reader = DatabaseManager(test_db)
+        reader.add_family_member("Bob", 40, {})
+        reader.store_memory("Bob", story, "story")
+
+        # Two connections opening the shard with compression on share one dictionary
+        writer = DatabaseManager(test_db, compress_text=True)
+        other = DatabaseManager(test_db, compress_text=True)
+        assert list(writer.compressors[0].dictionaries) == list(other.compressors[0].dictionaries) == [1]
+
+        assert writer.compress_existing_memories() == 1
+        assert writer.train_text_dictionary()
+        later = "Then we drove home and cooked the fish for dinner with the whole family."
+        writer.store_memory("Bob", later, "story")
+
+        writer.cursors[0].execute('SELECT text_format FROM memories ORDER BY id')
+        assert [row[0] for row in writer.cursors[0].fetchall()] == [1, 2]
+
+        # The reader opened before any dictionary existed, the other before the retrain
+        assert [row[2] for row in reader.get_memories("Bob")] == [later, story]
+        assert reader.store_memory("Bob", story + " Brr!", "story") == 1
+        assert sorted(row[2] for row in other.get_memories("Bob")) == sorted([later, story])
+
+    finally:
+        for db in (reader, writer, other):
+            if db:
+                db.close_connection()
+        remove_db_files(test_db)
+
+def test_compression_reclaims_disk_space():
+    """Test that compressing existing rows shrinks the database file."""
+    test_db = "test_compression_size.db"
+    remove_db_files(test_db)
+    db = None
+    words = "the kids went to the beach today and we had a great time fixing the bike with grandpa".split()
+
+    try:
+        db = DatabaseManager(test_db, dedup_distance=None)
+        db.add_family_member("Alice", 35, {})
+        for i in range(1000):
+            db.store_memory("Alice", ' '.join(words[i % 5:] + words[:i % 5]) + f" {i}", "daily_life")
+        db.close_connection()
+
+        db = DatabaseManager(test_db, compress_text=True)
+        before = db.database_size()
+        assert db.compress_existing_memories() == 1000
+        assert db.database_size() < before * 0.8
+        assert db.get_memory_stats("Alice")[0] == 1000
+
+        # The dictionary is measured on rows it wasn't trained on
+        report = benchmark(test_db)
+        assert report['file_bytes'] == db.database_size()
+        assert (report['training_rows'], report['measured_rows']) == (500, 500)
+        assert report['zlib_dictionary']['ratio'] < report['zlib']['ratio'] < 1
+
+    finally:
+        if db:
+            db.close_connection()
+        remove_db_files(test_db)
@@ -0,0 +1,59 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add the project root directory to the Python path
+project_root = Path(__file__).parent.parent
+sys.path.append(str(project_root))
+
+from src.load_generator import SimulatedMember, percentile, run_load_test
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([7], 95) == 7
+    assert percentile([], 50) is None
+
+def test_run_load_test():
+    """Test a small load run against the Ollama stub."""
+    report = run_load_test(members=3, messages=4, latency=0.01, jitter=0.0,
+                           db_path="test_load.db", num_shards=2)
+    print(report)
+
+    assert report['requests'] == 12
+    assert report['errors'] == 0
+    assert report['latency_ms']['count'] == 12
+    assert report['latency_ms']['p50'] <= report['latency_ms']['p99']
+    assert report['sqlite']['store_memory_ms']['count'] == 12
+    assert report['sqlite']['write_ms']['count'] == 12
+    assert report['sqlite']['write_ms']['max'] <= report['sqlite']['store_memory_ms']['max']
+    assert report['sqlite']['store_errors'] == 0
+    assert not Path("test_load.shard0.db").exists()
+
+def test_run_load_test_keeps_existing_database():
+    """Test that an existing database is never wiped without overwrite."""
+    test_db = Path("test_load_existing.db")
+    test_db.write_bytes(b"precious")
+
+    try:
+        try:
+            run_load_test(members=1, messages=1, latency=0.0, jitter=0.0, db_path=str(test_db))
+            assert False, "Expected FileExistsError"
+        except FileExistsError:
+            pass
+        assert test_db.read_bytes() == b"precious"
+    finally:
+        test_db.unlink()
+
+def test_simulated_member_reports_startup_errors():
+    """Test that a member whose chatbot fails to open records the error."""
+    start_event = threading.Event()
+    start_event.set()
+    member = SimulatedMember("Member0", "test_load_error.db", 2, 0.0, 0, start_event, {'num_shards': 0})
+    member.start()
+    member.join()
+
+    assert member.ready.is_set()
+    assert member.errors == ["ValueError: num_shards must be at least 1"]